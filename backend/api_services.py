@@ -1,164 +1,111 @@
-import yfinance as yf
-from pycoingecko import CoinGeckoAPI
-import pandas as pd
 from datetime import datetime, timedelta
 import random
 import time
 
-# Inicializar la API de CoinGecko
-cg = CoinGeckoAPI()
+from cache import cached
 
-# Caché para limitar las llamadas a las APIs
-price_cache = {}
-history_cache = {}
+# Tiempo de vida de la caché compartida para limitar las llamadas a las APIs
 cache_expiry = 10  # Reducido de 60 a 10 segundos para actualizaciones más frecuentes
 
-def get_stock_price(ticker, force_refresh=False):
-    """Obtiene el precio actual de una acción usando yfinance"""
-    cache_key = f"stock_{ticker}"
+# Días extra de historial que se piden antes del primer día a valorar, para tener
+# un cierre real aunque ese día caiga en fin de semana o feriado
+HISTORY_LOOKBACK_DAYS = 10
+
+# yfinance (que importa pandas) y pycoingecko se cargan en el primer uso para no
+# penalizar el arranque de cada worker
+_cg = None
+
+def get_coingecko():
+    """Inicializa el cliente de CoinGecko en el primer uso"""
+    global _cg
+    if _cg is None:
+        from pycoingecko import CoinGeckoAPI
+        _cg = CoinGeckoAPI()
+    return _cg
+
+def fetch_with_retry(fetch, ticker, description):
+    """Ejecuta fetch y reintenta una vez si la API falla"""
+    try:
+        return fetch(ticker)
+    except Exception as e:
+        print(f"Error al obtener {description} {ticker}: {e}")
+        time.sleep(1)  # Esperar un segundo antes de reintentar
+        return fetch(ticker)
+
+def fetch_stock_price(ticker):
+    """Consulta a yfinance el precio actual de una acción, sin caché"""
+    import yfinance as yf
+
+    stock = yf.Ticker(ticker)
+    info = stock.info
     
-    # Verificar si hay datos en caché y si son recientes, a menos que se fuerce la actualización
-    if not force_refresh and cache_key in price_cache and time.time() - price_cache[cache_key]['timestamp'] < cache_expiry:
-        return price_cache[cache_key]['data']
+    # Obtener el precio actual y el cambio porcentual
+    current_price = info.get('regularMarketPrice', 0)
+    previous_close = info.get('previousClose', current_price)
     
+    if previous_close == 0:
+        price_change_24h = 0
+    else:
+        price_change_24h = ((current_price - previous_close) / previous_close) * 100
+    
+    return {
+        'ticker': ticker,
+        'current_price': current_price,
+        'price_change_24h': price_change_24h,
+        'last_updated': datetime.now(),
+        'is_simulated': False  # Indicador para saber si los datos son reales
+    }
+
+def fetch_crypto_price(ticker):
+    """Consulta a CoinGecko el precio actual de una criptomoneda, sin caché"""
+    coin_data = get_coingecko().get_coin_by_id(
+        id=get_crypto_id(ticker),
+        localization=False,
+        tickers=False,
+        market_data=True,
+        community_data=False,
+        developer_data=False
+    )
+    
+    return {
+        'ticker': ticker,
+        'current_price': coin_data['market_data']['current_price']['usd'],
+        'price_change_24h': coin_data['market_data']['price_change_percentage_24h'],
+        'last_updated': datetime.now(),
+        'is_simulated': False  # Indicador para saber si los datos son reales
+    }
+
+def get_stock_price(ticker, force_refresh=False):
+    """Obtiene el precio actual de una acción usando yfinance"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        # Obtener el precio actual y el cambio porcentual
-        current_price = info.get('regularMarketPrice', 0)
-        previous_close = info.get('previousClose', current_price)
-        
-        if previous_close == 0:
-            price_change_24h = 0
-        else:
-            price_change_24h = ((current_price - previous_close) / previous_close) * 100
-        
-        result = {
-            'ticker': ticker,
-            'current_price': current_price,
-            'price_change_24h': price_change_24h,
-            'last_updated': datetime.now(),
-            'is_simulated': False  # Indicador para saber si los datos son reales
-        }
-        
-        # Guardar en caché
-        price_cache[cache_key] = {
-            'data': result,
-            'timestamp': time.time()
-        }
-        
-        return result
-    except Exception as e:
-        print(f"Error al obtener precio de acción {ticker}: {e}")
-        # Intentar una vez más antes de devolver datos simulados
-        try:
-            time.sleep(1)  # Esperar un segundo antes de reintentar
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            current_price = info.get('regularMarketPrice', 0)
-            previous_close = info.get('previousClose', current_price)
-            
-            if previous_close == 0:
-                price_change_24h = 0
-            else:
-                price_change_24h = ((current_price - previous_close) / previous_close) * 100
-            
-            result = {
-                'ticker': ticker,
-                'current_price': current_price,
-                'price_change_24h': price_change_24h,
-                'last_updated': datetime.now(),
-                'is_simulated': False
-            }
-            
-            price_cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
-            
-            return result
-        except:
-            # Si falla nuevamente, devolver datos simulados
-            return simulate_price_data(ticker)
+        # La caché es compartida por todos los workers del host
+        return cached(
+            f"stock_{ticker}",
+            cache_expiry,
+            lambda: fetch_with_retry(fetch_stock_price, ticker, "precio de acción"),
+            force_refresh=force_refresh
+        )
+    except Exception:
+        # Si falla nuevamente, devolver datos simulados
+        return simulate_price_data(ticker)
 
 def get_crypto_price(ticker, force_refresh=False):
     """Obtiene el precio actual de una criptomoneda usando CoinGecko"""
-    cache_key = f"crypto_{ticker}"
-    
-    # Verificar si hay datos en caché y si son recientes, a menos que se fuerce la actualización
-    if not force_refresh and cache_key in price_cache and time.time() - price_cache[cache_key]['timestamp'] < cache_expiry:
-        return price_cache[cache_key]['data']
+    # Convertir ticker a formato de CoinGecko (ej. BTC -> bitcoin)
+    if not get_crypto_id(ticker):
+        return simulate_price_data(ticker)
     
     try:
-        # Convertir ticker a formato de CoinGecko (ej. BTC -> bitcoin)
-        crypto_id = get_crypto_id(ticker)
-        
-        if not crypto_id:
-            return simulate_price_data(ticker)
-        
-        # Obtener datos de la criptomoneda
-        coin_data = cg.get_coin_by_id(
-            id=crypto_id,
-            localization=False,
-            tickers=False,
-            market_data=True,
-            community_data=False,
-            developer_data=False
+        # La caché es compartida por todos los workers del host
+        return cached(
+            f"crypto_{ticker}",
+            cache_expiry,
+            lambda: fetch_with_retry(fetch_crypto_price, ticker, "precio de criptomoneda"),
+            force_refresh=force_refresh
         )
-        
-        current_price = coin_data['market_data']['current_price']['usd']
-        price_change_24h = coin_data['market_data']['price_change_percentage_24h']
-        
-        result = {
-            'ticker': ticker,
-            'current_price': current_price,
-            'price_change_24h': price_change_24h,
-            'last_updated': datetime.now(),
-            'is_simulated': False  # Indicador para saber si los datos son reales
-        }
-        
-        # Guardar en caché
-        price_cache[cache_key] = {
-            'data': result,
-            'timestamp': time.time()
-        }
-        
-        return result
-    except Exception as e:
-        print(f"Error al obtener precio de criptomoneda {ticker}: {e}")
-        # Intentar una vez más antes de devolver datos simulados
-        try:
-            time.sleep(1)  # Esperar un segundo antes de reintentar
-            coin_data = cg.get_coin_by_id(
-                id=crypto_id,
-                localization=False,
-                tickers=False,
-                market_data=True,
-                community_data=False,
-                developer_data=False
-            )
-            
-            current_price = coin_data['market_data']['current_price']['usd']
-            price_change_24h = coin_data['market_data']['price_change_percentage_24h']
-            
-            result = {
-                'ticker': ticker,
-                'current_price': current_price,
-                'price_change_24h': price_change_24h,
-                'last_updated': datetime.now(),
-                'is_simulated': False
-            }
-            
-            price_cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
-            
-            return result
-        except:
-            # Si falla nuevamente, devolver datos simulados
-            return simulate_price_data(ticker)
+    except Exception:
+        # Si falla nuevamente, devolver datos simulados
+        return simulate_price_data(ticker)
 
 def get_crypto_id(ticker):
     """Convierte un ticker de criptomoneda a su ID en CoinGecko"""
@@ -192,103 +139,138 @@ def simulate_price_data(ticker):
     }
 
 def get_historical_prices(ticker, asset_type, days=30):
-    """Obtiene los precios históricos de un activo"""
-    cache_key = f"{asset_type}_{ticker}_history_{days}"
-    
-    # Verificar si hay datos en caché y si son recientes
-    if cache_key in history_cache and time.time() - history_cache[cache_key]['timestamp'] < cache_expiry * 10:
-        return history_cache[cache_key]['data']
+    """Obtiene los precios históricos de un activo; si la API falla, 'is_simulated' es True"""
+    if asset_type == "stock":
+        fetch = get_stock_historical_prices
+    elif asset_type == "crypto":
+        fetch = get_crypto_historical_prices
+    else:
+        # Si no se reconoce el tipo de activo, devolver datos simulados
+        return simulate_historical_prices(days)
     
     try:
-        if asset_type == "stock":
-            return get_stock_historical_prices(ticker, days)
-        elif asset_type == "crypto":
-            return get_crypto_historical_prices(ticker, days)
+        return cached(
+            f"{asset_type}_{ticker}_history_{days}",
+            cache_expiry * 10,
+            lambda: fetch(ticker, days)
+        )
     except Exception as e:
         print(f"Error al obtener historial de precios para {ticker}: {e}")
     
-    # Si hay un error o no se reconoce el tipo de activo, devolver datos simulados
+    # Si hay un error, devolver datos simulados (que no se guardan en caché)
     return simulate_historical_prices(days)
 
 def get_stock_historical_prices(ticker, days=30):
-    """Obtiene los precios históricos de una acción"""
+    """Obtiene los precios históricos de una acción, sin caché"""
+    import yfinance as yf
+
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    try:
-        data = yf.download(ticker, start=start_date, end=end_date)
-        
-        if data.empty:
-            return simulate_historical_prices(days)
-        
-        # Formatear los datos para el frontend
-        dates = data.index.strftime('%Y-%m-%d').tolist()
-        prices = data['Close'].tolist()
-        
-        result = {
-            'dates': dates,
-            'values': prices
-        }
-        
-        # Guardar en caché
-        history_cache[f"stock_{ticker}_history_{days}"] = {
-            'data': result,
-            'timestamp': time.time()
-        }
-        
-        return result
-    except:
-        return simulate_historical_prices(days)
+    data = yf.download(ticker, start=start_date, end=end_date)
+    
+    if data.empty:
+        raise ValueError(f"Sin datos históricos para {ticker}")
+    
+    # Formatear los datos para el frontend
+    return {
+        'dates': data.index.strftime('%Y-%m-%d').tolist(),
+        'values': data['Close'].tolist(),
+        'is_simulated': False
+    }
 
 def get_crypto_historical_prices(ticker, days=30):
-    """Obtiene los precios históricos de una criptomoneda"""
+    """Obtiene los precios históricos de una criptomoneda, sin caché"""
     crypto_id = get_crypto_id(ticker)
     
     if not crypto_id:
-        return simulate_historical_prices(days)
+        raise ValueError(f"Criptomoneda no soportada: {ticker}")
     
-    try:
-        # Obtener datos históricos de CoinGecko
-        market_data = cg.get_coin_market_chart_by_id(id=crypto_id, vs_currency='usd', days=days)
-        
-        # Formatear los datos para el frontend
-        price_data = market_data['prices']
-        dates = [datetime.fromtimestamp(price[0]/1000).strftime('%Y-%m-%d') for price in price_data]
-        prices = [price[1] for price in price_data]
-        
-        result = {
-            'dates': dates,
-            'values': prices
-        }
-        
-        # Guardar en caché
-        history_cache[f"crypto_{ticker}_history_{days}"] = {
-            'data': result,
-            'timestamp': time.time()
-        }
-        
-        return result
-    except:
-        return simulate_historical_prices(days)
+    # Obtener datos históricos de CoinGecko
+    market_data = get_coingecko().get_coin_market_chart_by_id(id=crypto_id, vs_currency='usd', days=days)
+    
+    # Formatear los datos para el frontend
+    price_data = market_data['prices']
+    return {
+        'dates': [datetime.fromtimestamp(price[0]/1000).strftime('%Y-%m-%d') for price in price_data],
+        'values': [price[1] for price in price_data],
+        'is_simulated': False
+    }
+
+def get_daily_closes(ticker, asset_type, days):
+    """Cierre real de cada día de `days` (DatetimeIndex diario) como array de NumPy.
+
+    Cada día usa el último cierre conocido hasta ese día, nunca uno posterior. Los
+    días sin un cierre anterior, o todos si el historial es simulado, quedan en NaN.
+    """
+    import numpy as np
+    import pandas as pd
+
+    history_days = (datetime.now().date() - days[0].date()).days + HISTORY_LOOKBACK_DAYS
+    price_history = get_historical_prices(ticker, asset_type, history_days)
+    if price_history.get('is_simulated'):
+        return np.full(len(days), np.nan)
+
+    prices = pd.Series(price_history['values'], index=pd.to_datetime(price_history['dates']), dtype=float)
+    # Con varios precios por día (datos intradía) se toma el último como cierre
+    prices = prices[~prices.index.duplicated(keep='last')].sort_index()
+    return prices.reindex(days, method='ffill').to_numpy(dtype=float)
+
+def get_fx_historical_rates(currency, start_date, end_date):
+    """Obtiene de yfinance las cotizaciones diarias de una moneda (unidades por 1 USD), sin caché"""
+    import yfinance as yf
+
+    # En Yahoo Finance "EUR=X" es la cotización USD/EUR
+    data = yf.download(f"{currency}=X", start=start_date, end=end_date + timedelta(days=1))
+    
+    if data.empty:
+        raise ValueError(f"Sin cotizaciones para {currency}")
+    
+    return {
+        'dates': data.index.strftime('%Y-%m-%d').tolist(),
+        'values': data['Close'].tolist()
+    }
+
+def get_price_matrix(assets, start_date, end_date):
+    """Matriz de precios [día, activo] desde start_date hasta end_date; la última fila usa el precio actual.
+
+    Los días sin cierre real (API caída o antes del primer cierre) quedan en NaN.
+    """
+    import numpy as np
+    import pandas as pd
+
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+    matrix = np.empty((len(days), len(assets)))
+
+    for column, (ticker, asset_type) in enumerate(assets):
+        matrix[:, column] = get_daily_closes(ticker, asset_type, days)
+
+        if asset_type == "stock":
+            price_data = get_stock_price(ticker)
+        else:
+            price_data = get_crypto_price(ticker)
+        matrix[-1, column] = np.nan if price_data.get('is_simulated') else price_data['current_price']
+
+    return matrix
 
 def simulate_historical_prices(days=30):
     """Genera datos históricos simulados"""
     end_date = datetime.now()
     dates = [(end_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days, -1, -1)]
     
+    import numpy as np
+    
     # Generar una tendencia aleatoria pero realista
     base_price = random.uniform(50, 500)
     volatility = random.uniform(0.005, 0.03)
     trend = random.uniform(-0.01, 0.01)
     
-    prices = []
-    current_price = base_price
-    
-    for _ in range(len(dates)):
-        current_price = current_price * (1 + trend + random.uniform(-volatility, volatility))
-        prices.append(round(current_price, 2))
+    # Todos los pasos del random walk en una sola operación vectorizada
+    steps = 1 + trend + np.random.default_rng().uniform(-volatility, volatility, len(dates))
+    prices = np.round(base_price * np.cumprod(steps), 2)
     
     return {
         'dates': dates,
-        'values': prices
+        'values': prices.tolist(),
+        'is_simulated': True
     }
\ No newline at end of file
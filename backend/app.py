@@ -1,22 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import pandas as pd
-from datetime import datetime, timedelta
-import random
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
 
-from database import get_db, TransactionModel, PriceHistoryModel, UserModel, get_password_hash
+from database import engine, get_db, init_db, TransactionModel, PriceHistoryModel, UserModel, get_password_hash
 from models import (
     TransactionCreate, Transaction, PortfolioSummary, 
     PortfolioAsset, PortfolioHistory, AssetAllocation,
+    AssetRisk, PortfolioRisk, ProjectionBand, PortfolioProjection,
     UserCreate, User, Token
 )
 from api_services import (
-    get_stock_price, get_crypto_price, 
-    get_historical_prices, simulate_historical_prices
+    get_stock_price, get_crypto_price, simulate_historical_prices
 )
+from fx import BASE_CURRENCY, SUPPORTED_CURRENCIES, get_fx_rates
+from lots import update_positions
+from snapshots import get_daily_values, invalidate_snapshots, backfill_snapshots
 from auth import authenticate_user, create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
 
 app = FastAPI(title="Portfolio Investment API")
@@ -28,6 +34,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El cursor de paginación de /transactions/ viaja en un header
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Endpoint para registrar un nuevo usuario
@@ -80,6 +88,7 @@ async def read_users_me(current_user = Depends(get_current_active_user)):
 @app.post("/transactions/", response_model=Transaction)
 def create_transaction(
     transaction: TransactionCreate, 
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
@@ -94,67 +103,166 @@ def create_transaction(
     db.add(db_transaction)
     db.commit()
     db.refresh(db_transaction)
+    
+    # Una transacción con fecha pasada cambia los valores de cierre ya guardados:
+    # se eliminan desde ese día y se recalculan después de responder
+    transaction_day = db_transaction.transaction_date.date()
+    if transaction_day < date.today():
+        invalidate_snapshots(db, current_user.id, transaction_day)
+        background_tasks.add_task(backfill_snapshots, current_user.id)
+    
     return db_transaction
 
-# Endpoint para obtener todas las transacciones del usuario actual
+# Endpoint para obtener todas las transacciones del usuario actual.
+# Con after_id se pagina por cursor (id > after_id) en lugar de saltear filas con skip,
+# así las páginas profundas no vuelven a recorrer todo lo anterior
 @app.get("/transactions/", response_model=List[Transaction])
 def read_transactions(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
+    after_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    transactions = db.query(TransactionModel).filter(
+    query = db.query(TransactionModel).filter(
         TransactionModel.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ).order_by(TransactionModel.id)
+    
+    if after_id is not None:
+        query = query.filter(TransactionModel.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    transactions = query.limit(limit).all()
+    
+    # Cursor para pedir la página siguiente
+    if len(transactions) == limit:
+        response.headers["X-Next-Cursor"] = str(transactions[-1].id)
     return transactions
 
+# Columnas de la exportación de transacciones
+EXPORT_COLUMNS = ("id", "asset_type", "ticker", "price", "quantity", "transaction_date")
+# Filas leídas por bloque del cursor al exportar
+EXPORT_CHUNK_SIZE = 1000
+
+def stream_transactions(user_id, export_format):
+    """Genera la exportación por bloques directamente desde el cursor, sin objetos ORM ni Pydantic"""
+    stmt = select(
+        *(getattr(TransactionModel, column) for column in EXPORT_COLUMNS)
+    ).where(
+        TransactionModel.user_id == user_id
+    ).order_by(TransactionModel.id)
+    
+    # La cabecera se envía antes de ejecutar la consulta
+    if export_format == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+    
+    # Conexión propia: la respuesta sigue enviándose después de que termina el endpoint
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_CHUNK_SIZE).execute(stmt)
+        for rows in result.partitions():
+            buffer = io.StringIO()
+            if export_format == "csv":
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    (tx_id, asset_type, ticker, price, quantity, tx_date.isoformat())
+                    for tx_id, asset_type, ticker, price, quantity, tx_date in rows
+                )
+            else:
+                for row in rows:
+                    record = dict(zip(EXPORT_COLUMNS, row))
+                    record["transaction_date"] = record["transaction_date"].isoformat()
+                    buffer.write(json.dumps(record) + "\n")
+            yield buffer.getvalue()
+
+# Endpoint para exportar todas las transacciones del usuario actual en CSV o NDJSON
+@app.get("/transactions/export/")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user = Depends(get_current_active_user)
+):
+    if format == "csv":
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
+    
+    return StreamingResponse(
+        stream_transactions(current_user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"}
+    )
+
+# Campos monetarios de cada activo que se convierten a la moneda pedida
+MONEY_FIELDS = ("avg_buy_price", "current_price", "total_value", "profit_loss", "realized_profit_loss")
+
+# Código de la moneda pedida en mayúsculas; solo se aceptan las monedas soportadas
+def parse_currency(currency):
+    currency = currency.upper()
+    if currency not in SUPPORTED_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"Moneda no soportada: {currency}")
+    return currency
+
+# Convierte montos en USD a la moneda pedida con la cotización de cada fecha (una
+# fila de amounts por fecha). Un monto distinto de 0 sin cotización (la API no
+# respondió o la fecha es anterior a la primera cotización) no se puede convertir
+def convert_amounts(db: Session, currency, dates, amounts):
+    import numpy as np
+    
+    try:
+        rates = get_fx_rates(db, currency, dates)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Cotizaciones no disponibles para {currency}"
+        )
+    amounts = np.asarray(amounts, dtype=float)
+    rates = rates.reshape((-1,) + (1,) * (amounts.ndim - 1))
+    if (np.isnan(rates) & (amounts != 0)).any():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Sin cotizaciones de {currency} para todas las fechas pedidas"
+        )
+    return np.where(amounts != 0, amounts * rates, 0.0)
+
 # Endpoint para obtener el resumen del portfolio del usuario actual
 @app.get("/portfolio/summary/", response_model=PortfolioSummary)
 def get_portfolio_summary(
+    currency: str = Query(BASE_CURRENCY, pattern="^[A-Za-z]{3}$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    # Obtener todas las transacciones del usuario
-    transactions = db.query(TransactionModel).filter(
-        TransactionModel.user_id == current_user.id
-    ).all()
+    currency = parse_currency(currency)
+    
+    # Actualizar los lotes FIFO de cada posición con las transacciones nuevas
+    positions = update_positions(db, current_user.id)
     
     # Si no hay transacciones, devolver un portfolio vacío
-    if not transactions:
+    if not positions:
         return PortfolioSummary(
             total_value=0,
             daily_change_percent=0,
-            assets=[]
+            assets=[],
+            currency=currency
         )
     
-    # Agrupar transacciones por ticker y tipo de activo
-    portfolio = {}
-    for tx in transactions:
-        key = (tx.ticker, tx.asset_type)
-        if key not in portfolio:
-            portfolio[key] = {
-                'ticker': tx.ticker,
-                'asset_type': tx.asset_type,
-                'total_quantity': 0,
-                'total_cost': 0
-            }
-        
-        portfolio[key]['total_quantity'] += tx.quantity
-        portfolio[key]['total_cost'] += tx.price * tx.quantity
-    
-    # Calcular el precio promedio de compra y obtener precios actuales
+    # Obtener precios actuales y calcular ganancias de los lotes abiertos
     portfolio_assets = []
     total_value = 0
-    total_cost = 0
+    realized_profit_loss = 0
+    unrealized_profit_loss = 0
     
-    for (ticker, asset_type), asset in portfolio.items():
-        # Omitir activos con cantidad 0
-        if asset['total_quantity'] <= 0:
+    for (ticker, asset_type), lots in positions.items():
+        realized_profit_loss += lots.realized_pnl
+        
+        # Omitir activos sin lotes abiertos
+        quantity = lots.open_quantity
+        if quantity <= 0:
             continue
             
-        # Calcular precio promedio de compra
-        avg_buy_price = asset['total_cost'] / asset['total_quantity'] if asset['total_quantity'] > 0 else 0
+        # Precio promedio de compra de los lotes que siguen abiertos
+        open_cost = lots.open_cost
+        avg_buy_price = open_cost / quantity
         
         # Obtener precio actual
         if asset_type == "stock":
@@ -165,26 +273,27 @@ def get_portfolio_summary(
         current_price = price_data['current_price']
         price_change_24h = price_data['price_change_24h']
         
-        # Calcular valor actual y ganancias/pérdidas
-        asset_value = current_price * asset['total_quantity']
-        profit_loss = asset_value - asset['total_cost']
-        profit_loss_percent = (profit_loss / asset['total_cost']) * 100 if asset['total_cost'] > 0 else 0
+        # Calcular valor actual y ganancias/pérdidas no realizadas
+        asset_value = current_price * quantity
+        profit_loss = asset_value - open_cost
+        profit_loss_percent = (profit_loss / open_cost) * 100 if open_cost > 0 else 0
         
         # Agregar al valor total
         total_value += asset_value
-        total_cost += asset['total_cost']
+        unrealized_profit_loss += profit_loss
         
         # Crear objeto de activo para el portfolio
         portfolio_asset = PortfolioAsset(
             ticker=ticker,
             asset_type=asset_type,
-            quantity=asset['total_quantity'],
+            quantity=quantity,
             avg_buy_price=avg_buy_price,
             current_price=current_price,
             price_change_24h=price_change_24h,
             total_value=asset_value,
             profit_loss=profit_loss,
-            profit_loss_percent=profit_loss_percent
+            profit_loss_percent=profit_loss_percent,
+            realized_profit_loss=lots.realized_pnl
         )
         
         portfolio_assets.append(portfolio_asset)
@@ -198,90 +307,89 @@ def get_portfolio_summary(
     # Ordenar activos por valor (de mayor a menor)
     portfolio_assets.sort(key=lambda x: x.total_value, reverse=True)
     
+    # Convertir de USD a la moneda pedida con una sola multiplicación sobre todos los importes
+    if currency != BASE_CURRENCY:
+        amounts = convert_amounts(db, currency, [date.today()], [
+            [getattr(asset, field) for field in MONEY_FIELDS] for asset in portfolio_assets
+        ] + [[total_value, realized_profit_loss, unrealized_profit_loss, 0, 0]])
+        portfolio_assets = [
+            asset.model_copy(update=dict(zip(MONEY_FIELDS, row)))
+            for asset, row in zip(portfolio_assets, amounts[:-1].tolist())
+        ]
+        total_value, realized_profit_loss, unrealized_profit_loss = amounts[-1, :3].tolist()
+    
     return PortfolioSummary(
         total_value=total_value,
         daily_change_percent=daily_change_percent,
-        assets=portfolio_assets
+        assets=portfolio_assets,
+        realized_profit_loss=realized_profit_loss,
+        unrealized_profit_loss=unrealized_profit_loss,
+        currency=currency
     )
 
 # Endpoint para obtener el historial del portfolio del usuario actual
 @app.get("/portfolio/history/", response_model=PortfolioHistory)
 def get_portfolio_history(
     days: int = 30, 
+    currency: str = Query(BASE_CURRENCY, pattern="^[A-Za-z]{3}$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    # Obtener todas las transacciones del usuario
-    transactions = db.query(TransactionModel).filter(
+    currency = parse_currency(currency)
+    
+    # Obtener la cantidad actual de cada activo del usuario
+    holdings = db.query(
+        TransactionModel.ticker,
+        TransactionModel.asset_type,
+        func.sum(TransactionModel.quantity)
+    ).filter(
         TransactionModel.user_id == current_user.id
-    ).all()
+    ).group_by(TransactionModel.ticker, TransactionModel.asset_type).all()
     
     # Si no hay transacciones, devolver datos simulados
-    if not transactions:
+    if not holdings:
         return simulate_historical_prices(days)
     
-    # Agrupar transacciones por ticker y tipo de activo
-    assets = {}
-    for tx in transactions:
-        key = (tx.ticker, tx.asset_type)
-        if key not in assets:
-            assets[key] = []
-        assets[key].append(tx)
-    
     # Fecha actual y fecha de inicio
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # Crear un DataFrame con todas las fechas
-    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-    portfolio_history = pd.DataFrame(index=date_range)
-    portfolio_history['total_value'] = 0
-    
-    # Para cada activo, obtener su historial de precios y calcular el valor diario
-    for (ticker, asset_type), asset_transactions in assets.items():
-        # Obtener historial de precios
-        price_history = get_historical_prices(ticker, asset_type, days)
-        
-        # Convertir a DataFrame
-        price_df = pd.DataFrame({
-            'date': pd.to_datetime(price_history['dates']),
-            'price': price_history['values']
-        }).set_index('date')
-        
-        # Para cada día, calcular la cantidad de activos que tenía el usuario
-        for date in date_range:
-            # Filtrar transacciones anteriores a esta fecha
-            valid_txs = [tx for tx in asset_transactions if tx.transaction_date <= date]
-            
-            # Calcular cantidad total
-            quantity = sum(tx.quantity for tx in valid_txs)
-            
-            # Si hay cantidad positiva, calcular el valor
-            if quantity > 0:
-                # Obtener el precio más cercano a esta fecha
-                closest_date = price_df.index[price_df.index.get_indexer([date], method='nearest')[0]]
-                price = price_df.loc[closest_date, 'price']
-                
-                # Agregar al valor total del portfolio
-                portfolio_history.loc[date, 'total_value'] += price * quantity
-    
-    # Formatear para la respuesta
-    dates = portfolio_history.index.strftime('%Y-%m-%d').tolist()
-    values = portfolio_history['total_value'].tolist()
+    today = date.today()
+    start_date = today - timedelta(days=days)
+    
+    # Los días cerrados se leen de los valores guardados; solo se calculan los que falten
+    stored_values = get_daily_values(db, current_user.id, start_date, today - timedelta(days=1))
+    
+    # Valor en vivo para hoy con los precios actuales
+    today_value = 0
+    for ticker, asset_type, quantity in holdings:
+        if quantity > 0:
+            if asset_type == "stock":
+                price_data = get_stock_price(ticker)
+            else:
+                price_data = get_crypto_price(ticker)
+            today_value += price_data['current_price'] * quantity
+    
+    # Formatear para la respuesta (los días anteriores a la primera compra valen 0)
+    days_list = [start_date + timedelta(days=offset) for offset in range(days)] + [today]
+    values = [stored_values.get(day, 0) for day in days_list[:-1]] + [today_value]
+    
+    # Convertir cada día con la cotización de ese día, en una sola operación vectorizada
+    if currency != BASE_CURRENCY:
+        values = convert_amounts(db, currency, days_list, values).tolist()
     
     return PortfolioHistory(
-        dates=dates,
-        values=values
+        dates=[day.strftime('%Y-%m-%d') for day in days_list],
+        values=values,
+        currency=currency
     )
 
 # Endpoint para obtener la asignación del portfolio del usuario actual
 @app.get("/portfolio/allocation/", response_model=List[AssetAllocation])
 def get_portfolio_allocation(
+    currency: str = Query(BASE_CURRENCY, pattern="^[A-Za-z]{3}$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     # Obtener el resumen del portfolio
-    summary = get_portfolio_summary(db, current_user)
+    summary = get_portfolio_summary(currency, db, current_user)
     
     if not summary.assets:
         return []
@@ -301,6 +409,130 @@ def get_portfolio_allocation(
     
     return allocations
 
+# Valor actual de cada activo con lotes abiertos: {(ticker, tipo): valor}
+def get_current_holdings(db: Session, user_id):
+    holdings = {}
+    for (ticker, asset_type), lots in update_positions(db, user_id).items():
+        quantity = lots.open_quantity
+        if quantity <= 0:
+            continue
+        if asset_type == "stock":
+            price_data = get_stock_price(ticker)
+        else:
+            price_data = get_crypto_price(ticker)
+        holdings[(ticker, asset_type)] = price_data['current_price'] * quantity
+    return holdings
+
+# Endpoint para obtener las métricas de riesgo del portfolio del usuario actual
+@app.get("/portfolio/risk/", response_model=PortfolioRisk)
+def get_portfolio_risk(
+    days: int = Query(365, ge=2, le=3650),
+    benchmark: str = "SPY",
+    risk_free_rate: float = 0.0,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    # NumPy solo se necesita aquí: se importa en el primer uso para acelerar el arranque
+    from risk import MissingPricesError, compute_portfolio_risk
+    
+    benchmark = benchmark.upper()
+    holdings = get_current_holdings(db, current_user.id)
+    
+    # Si no hay activos (o no tienen valor), no hay riesgo que medir
+    if not holdings or sum(holdings.values()) <= 0:
+        return PortfolioRisk(
+            days=days,
+            benchmark=benchmark,
+            volatility=0,
+            annual_return=0,
+            max_drawdown=0,
+            sharpe_ratio=0,
+            assets=[],
+            correlation=[]
+        )
+    
+    try:
+        metrics = compute_portfolio_risk(holdings, days, benchmark, risk_free_rate)
+    except MissingPricesError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    
+    return PortfolioRisk(
+        days=days,
+        benchmark=benchmark,
+        volatility=metrics['volatility'],
+        annual_return=metrics['annual_return'],
+        max_drawdown=metrics['max_drawdown'],
+        sharpe_ratio=metrics['sharpe_ratio'],
+        beta=metrics['beta'],
+        assets=[
+            AssetRisk(ticker=ticker, asset_type=asset_type, weight=weight, volatility=volatility)
+            for (ticker, asset_type), weight, volatility in zip(
+                metrics['assets'], metrics['weights'], metrics['asset_volatility']
+            )
+        ],
+        correlation=metrics['correlation'],
+        missing_assets=[ticker for ticker, _ in metrics['missing']]
+    )
+
+# Endpoint para proyectar el valor del portfolio con simulación Monte Carlo
+@app.get("/portfolio/projection/", response_model=PortfolioProjection)
+def get_portfolio_projection(
+    horizon_days: int = Query(90, ge=1, le=730),
+    paths: int = Query(5000, ge=100, le=20000),
+    history_days: int = Query(365, ge=30, le=3650),
+    seed: Optional[int] = None,
+    memory_budget_mb: Optional[int] = Query(None, ge=1, le=1024),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    # NumPy solo se necesita aquí: se importa en el primer uso para acelerar el arranque
+    from projection import project_portfolio, DEFAULT_MEMORY_BUDGET, DEFAULT_PERCENTILES
+    from risk import MissingPricesError
+    
+    holdings = get_current_holdings(db, current_user.id)
+    initial_value = sum(holdings.values())
+    
+    today = date.today()
+    dates = [(today + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(horizon_days + 1)]
+    
+    # Sin activos la proyección es constante en 0
+    if initial_value <= 0:
+        return PortfolioProjection(
+            initial_value=0,
+            paths=paths,
+            seed=seed,
+            dates=dates,
+            bands=[ProjectionBand(percentile=p, values=[0] * len(dates)) for p in DEFAULT_PERCENTILES]
+        )
+    
+    # Los caminos se simulan por bloques dentro del presupuesto de memoria
+    try:
+        bands, missing = project_portfolio(
+            holdings,
+            horizon_days,
+            paths,
+            history_days=history_days,
+            seed=seed,
+            memory_budget=memory_budget_mb * 1024 * 1024 if memory_budget_mb else DEFAULT_MEMORY_BUDGET
+        )
+    except MissingPricesError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # El primer punto es el valor actual
+    return PortfolioProjection(
+        initial_value=initial_value,
+        paths=paths,
+        seed=seed,
+        dates=dates,
+        bands=[
+            ProjectionBand(percentile=p, values=[initial_value] + band.tolist())
+            for p, band in zip(DEFAULT_PERCENTILES, bands)
+        ],
+        missing_assets=[ticker for ticker, _ in missing]
+    )
+
 # Endpoint para obtener el precio de un activo
 @app.get("/price/{asset_type}/{ticker}")
 def get_asset_price(asset_type: str, ticker: str):
@@ -313,42 +545,8 @@ def get_asset_price(asset_type: str, ticker: str):
     else:
         raise HTTPException(status_code=400, detail="Tipo de activo no válido")
 
-# Ya no necesitamos agregar datos de ejemplo automáticamente
-# La función add_sample_data se elimina
-def add_sample_data(db: Session):
-    # Verificar si ya hay datos
-    if db.query(TransactionModel).count() > 0:
-        return
-    
-    # Datos de ejemplo
-    sample_data = [
-        # Acciones
-        {"asset_type": "stock", "ticker": "AAPL", "price": 150.25, "quantity": 10, "transaction_date": datetime.now() - timedelta(days=60)},
-        {"asset_type": "stock", "ticker": "MSFT", "price": 290.10, "quantity": 5, "transaction_date": datetime.now() - timedelta(days=45)},
-        {"asset_type": "stock", "ticker": "AMZN", "price": 3200.50, "quantity": 2, "transaction_date": datetime.now() - timedelta(days=30)},
-        {"asset_type": "stock", "ticker": "GOOGL", "price": 2800.75, "quantity": 3, "transaction_date": datetime.now() - timedelta(days=20)},
-        
-        # Criptomonedas
-        {"asset_type": "crypto", "ticker": "BTC", "price": 35000.00, "quantity": 0.5, "transaction_date": datetime.now() - timedelta(days=90)},
-        {"asset_type": "crypto", "ticker": "ETH", "price": 2400.00, "quantity": 3, "transaction_date": datetime.now() - timedelta(days=75)},
-        {"asset_type": "crypto", "ticker": "SOL", "price": 150.00, "quantity": 20, "transaction_date": datetime.now() - timedelta(days=40)},
-        {"asset_type": "crypto", "ticker": "ADA", "price": 2.10, "quantity": 1000, "transaction_date": datetime.now() - timedelta(days=25)},
-    ]
-    
-    # Agregar datos a la base de datos
-    for data in sample_data:
-        db_transaction = TransactionModel(**data)
-        db.add(db_transaction)
-    
-    db.commit()
-
-# Evento de inicio de la aplicación
-@app.on_event("startup")
-def startup_event():
-    db = next(get_db())
-    add_sample_data(db)
-
 # Ejecutar la aplicación
 if __name__ == "__main__":
     import uvicorn
+    init_db()
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
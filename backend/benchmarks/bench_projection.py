@@ -0,0 +1,67 @@
+"""Benchmark de la proyección Monte Carlo en caminos por segundo.
+
+Uso (desde el directorio backend):
+    python benchmarks/bench_projection.py [--assets 10] [--horizon 252]
+
+Compara un bucle escalar (un paso de random.gauss por día y activo, como la
+simulación original) con el motor vectorizado, con y sin límite de memoria.
+Usa rendimientos sintéticos, sin llamadas a las APIs de mercado.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from projection import correlation_factor, estimate_parameters, simulate_paths
+
+def scalar_paths(values, mu, cov, horizon, paths, seed=None):
+    """Referencia: la misma simulación paso a paso en Python puro"""
+    rng = random.Random(seed)
+    factor = correlation_factor(cov).tolist()
+    mu = mu.tolist()
+    assets = len(values)
+    result = []
+    for _ in range(paths):
+        log_growth = [0.0] * assets
+        path = []
+        for _ in range(horizon):
+            shocks = [rng.gauss(0, 1) for _ in range(assets)]
+            for i in range(assets):
+                log_growth[i] += mu[i] + sum(factor[i][j] * shocks[j] for j in range(i + 1))
+            path.append(sum(values[i] * math.exp(log_growth[i]) for i in range(assets)))
+        result.append(path)
+    return result
+
+def rate(function, paths):
+    started = time.perf_counter()
+    function()
+    return paths / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=10)
+    parser.add_argument("--horizon", type=int, default=252)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mixing = rng.normal(0, 0.01, (args.assets, args.assets))
+    returns = rng.multivariate_normal(np.full(args.assets, 0.0005), mixing @ mixing.T, size=365)
+    mu, cov = estimate_parameters(returns)
+    values = np.full(args.assets, 1000.0)
+    print(f"{args.assets} activos, horizonte de {args.horizon} días")
+
+    paths = 200
+    print(f"escalar                 {rate(lambda: scalar_paths(values, mu, cov, args.horizon, paths, seed=1), paths):12,.0f} caminos/s")
+
+    for paths in (1000, 10000, 20000):
+        print(f"vectorizado  {paths:6d}     {rate(lambda: simulate_paths(values, mu, cov, args.horizon, paths, seed=1, memory_budget=None), paths):12,.0f} caminos/s")
+        print(f"  por bloques (128 MB)   {rate(lambda: simulate_paths(values, mu, cov, args.horizon, paths, seed=1), paths):12,.0f} caminos/s")
+
+if __name__ == "__main__":
+    main()
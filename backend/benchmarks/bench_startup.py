@@ -0,0 +1,84 @@
+"""Benchmark de arranque: tiempo de importación de app.py y tiempo hasta la primera respuesta.
+
+Uso (desde el directorio backend):
+    python benchmarks/bench_startup.py [--runs 5]
+
+Cada medición se hace en un proceso nuevo para que no haya módulos ya importados.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t)"
+)
+
+def measure_import():
+    """Segundos que tarda 'import app' en un intérprete nuevo"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        stderr=subprocess.DEVNULL,
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_first_response(timeout=30):
+    """Segundos desde que se lanza uvicorn hasta la primera respuesta HTTP"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/price/unknown/X"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                urllib.request.urlopen(url, timeout=1)
+            except urllib.error.HTTPError:
+                # Cualquier respuesta HTTP (aquí un 400) indica que el servidor ya atiende
+                return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+                continue
+            return time.perf_counter() - start
+        raise RuntimeError("El servidor no respondió a tiempo")
+    finally:
+        server.terminate()
+        server.wait()
+
+def report(name, samples):
+    print(
+        f"{name:<22} mediana {statistics.median(samples) * 1000:8.1f} ms  "
+        f"min {min(samples) * 1000:8.1f} ms  max {max(samples) * 1000:8.1f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Primera ejecución descartada para que los .pyc ya estén compilados
+    measure_import()
+
+    report("import app", [measure_import() for _ in range(args.runs)])
+    report("primera respuesta", [measure_first_response() for _ in range(args.runs)])
+
+if __name__ == "__main__":
+    main()
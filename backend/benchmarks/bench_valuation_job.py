@@ -0,0 +1,89 @@
+"""Benchmark de escalado del job de valoración con 1, 2, 4 y 8 workers.
+
+Uso (desde el directorio backend):
+    python benchmarks/bench_valuation_job.py [--users 2000] [--transactions 50] [--days 365]
+
+Crea una base de datos SQLite temporal con datos sintéticos y usa precios
+simulados, así que no hace llamadas a las APIs de mercado.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, delete, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base, UserModel, TransactionModel, PortfolioDailyValueModel
+from valuation_job import run_valuation_job
+
+TICKERS = [(f"T{i:03d}", "stock" if i % 2 else "crypto") for i in range(100)]
+
+def build_database(url, users, transactions, days):
+    """Crea el esquema y carga usuarios y transacciones sintéticas"""
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.now()
+
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel), [
+            {'id': user_id, 'username': f"user{user_id}", 'email': f"user{user_id}@example.com", 'hashed_password': ""}
+            for user_id in range(1, users + 1)
+        ])
+        rows = []
+        for user_id in range(1, users + 1):
+            for _ in range(transactions):
+                ticker, asset_type = rng.choice(TICKERS)
+                rows.append({
+                    'user_id': user_id,
+                    'asset_type': asset_type,
+                    'ticker': ticker,
+                    'price': rng.uniform(10, 1000),
+                    'quantity': rng.uniform(0.5, 10) if rng.random() < 0.8 else -rng.uniform(0.1, 2),
+                    'transaction_date': now - timedelta(days=rng.uniform(1, days))
+                })
+        conn.execute(insert(TransactionModel), rows)
+    return engine
+
+def simulated_prices(assets, start_date, end_date):
+    """Random walk por activo, con la misma forma que api_services.get_price_matrix"""
+    rng = np.random.default_rng(42)
+    steps = (end_date - start_date).days + 1
+    returns = rng.normal(0.0005, 0.02, size=(steps, len(assets)))
+    return 100 * np.exp(np.cumsum(returns, axis=0))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = build_database(url, args.users, args.transactions, args.days)
+        print(f"{args.users} usuarios x {args.transactions} transacciones, {args.days} días de historial")
+
+        baseline = None
+        for workers in (1, 2, 4, 8):
+            # Cada ejecución parte sin valores guardados para recalcular todo el historial
+            with engine.begin() as conn:
+                conn.execute(delete(PortfolioDailyValueModel))
+
+            started = time.perf_counter()
+            stats = run_valuation_job(workers=workers, database_url=url, price_loader=simulated_prices)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers}  {elapsed:7.2f}s  {stats['users'] / elapsed:8.0f} usuarios/s  "
+                f"{stats['snapshots']} días  speedup x{baseline / elapsed:.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
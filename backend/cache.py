@@ -0,0 +1,316 @@
+import base64
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Backend de caché para los datos de mercado. Con varios workers de uvicorn/gunicorn
+# en el mismo host, "sqlite" (por defecto) o "redis" permiten que todos compartan
+# la misma caché y que cada ticker se consulte una sola vez por TTL en el host.
+#   CACHE_BACKEND=memory  -> diccionario en el proceso (un solo worker)
+#   CACHE_BACKEND=sqlite  -> archivo SQLite en modo WAL compartido entre procesos
+#   CACHE_BACKEND=redis   -> servidor local de Redis (requiere el paquete redis)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.getenv("CACHE_PATH", "data/market_cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Tiempo máximo que un worker puede reservar una clave mientras consulta la API
+LOCK_TIMEOUT = 15
+# Intervalo de espera mientras otro worker está obteniendo el mismo dato
+POLL_INTERVAL = 0.05
+# Tras un fallo de loader, los demás workers no repiten la consulta durante este tiempo
+FAILURE_TTL = 30
+# Las entradas más viejas que esto se borran: ningún TTL de lectura las acepta
+MAX_ENTRY_AGE = 86400
+# Cada cuánto, como mucho, se borran las entradas vencidas al escribir
+PURGE_INTERVAL = 300
+
+
+class CacheLoadError(Exception):
+    """loader falló hace menos de failure_ttl segundos; no se vuelve a consultar la API"""
+
+
+# Los valores se guardan como JSON y no con pickle: quien pueda escribir el archivo
+# de caché o el servidor de Redis no debe poder ejecutar código en los workers
+def serialize(value):
+    """Convierte a JSON un valor hecho de dicts, listas, tuplas, fechas y arrays de NumPy"""
+    return json.dumps(_encode(value)).encode()
+
+def deserialize(raw):
+    """Inverso de serialize; lanza ValueError si el dato no es JSON válido"""
+    return json.loads(raw, object_hook=_decode)
+
+def _encode(value):
+    # JSON no distingue tuplas de listas ni tiene fechas o arrays: se marcan con una clave especial
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if type(value).__module__ == 'numpy':
+        import numpy as np
+
+        if isinstance(value, np.ndarray):
+            buffer = io.BytesIO()
+            np.save(buffer, value, allow_pickle=False)
+            return {'__ndarray__': base64.b64encode(buffer.getvalue()).decode()}
+        return value.item()
+    return value
+
+def _decode(obj):
+    if len(obj) == 1:
+        if '__tuple__' in obj:
+            return tuple(obj['__tuple__'])
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__ndarray__' in obj:
+            import numpy as np
+
+            return np.load(io.BytesIO(base64.b64decode(obj['__ndarray__'])), allow_pickle=False)
+    return obj
+
+
+class MemoryCache:
+    """Caché en memoria del proceso actual"""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._mutex = threading.Lock()
+        self._purged_at = time.time()
+
+    def get(self, key, ttl):
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] >= ttl:
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        now = time.time()
+        self._entries[key] = (now, value)
+        if now - self._purged_at >= PURGE_INTERVAL:
+            self._purged_at = now
+            for old_key in [k for k, entry in list(self._entries.items()) if now - entry[0] >= MAX_ENTRY_AGE]:
+                self._entries.pop(old_key, None)
+
+    def acquire(self, key, timeout):
+        now = time.time()
+        with self._mutex:
+            if self._locks.get(key, 0) > now:
+                return False
+            self._locks[key] = now + timeout
+            return True
+
+    def release(self, key):
+        with self._mutex:
+            self._locks.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SQLiteCache:
+    """Caché compartida entre procesos sobre un archivo SQLite en modo WAL"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_at = time.time()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS locks ("
+            "key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        # Una conexión por hilo y por proceso: las conexiones no sobreviven a un fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, ttl):
+        row = self._connect().execute(
+            "SELECT value FROM entries WHERE key = ? AND stored_at > ?",
+            (key, time.time() - ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return deserialize(row[0])
+        except ValueError:
+            # Entrada con otro formato (por ejemplo, de una versión anterior)
+            return None
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, stored_at, value) VALUES (?, ?, ?)",
+            (key, now, serialize(value)),
+        )
+        if now - self._purged_at >= PURGE_INTERVAL:
+            self._purged_at = now
+            conn.execute("DELETE FROM entries WHERE stored_at < ?", (now - MAX_ENTRY_AGE,))
+            conn.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+
+    def acquire(self, key, timeout):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (key, expires_at) VALUES (?, ?)",
+                (key, now + timeout),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        self._connect().execute("DELETE FROM locks WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+class RedisCache:
+    """Caché compartida sobre un servidor local de Redis"""
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key, ttl):
+        raw = self._client.get(f"cache:{key}")
+        if raw is None:
+            return None
+        try:
+            stored_at, value = deserialize(raw)
+        except ValueError:
+            # Entrada con otro formato (por ejemplo, de una versión anterior)
+            return None
+        if time.time() - stored_at >= ttl:
+            return None
+        return value
+
+    def set(self, key, value):
+        # La expiración en Redis solo evita que las claves viejas se acumulen;
+        # la vigencia real la decide el TTL de cada lectura
+        self._client.set(f"cache:{key}", serialize([time.time(), value]), ex=MAX_ENTRY_AGE)
+
+    def acquire(self, key, timeout):
+        return bool(self._client.set(f"lock:{key}", os.getpid(), nx=True, px=int(timeout * 1000)))
+
+    def release(self, key):
+        self._client.delete(f"lock:{key}")
+
+    def clear(self):
+        for key in self._client.scan_iter("cache:*"):
+            self._client.delete(key)
+
+
+_cache = None
+_cache_mutex = threading.Lock()
+
+def get_cache():
+    """Devuelve la instancia de caché configurada para el proceso"""
+    global _cache
+    if _cache is None:
+        with _cache_mutex:
+            if _cache is None:
+                if CACHE_BACKEND == "memory":
+                    _cache = MemoryCache()
+                elif CACHE_BACKEND == "sqlite":
+                    _cache = SQLiteCache(CACHE_PATH)
+                elif CACHE_BACKEND == "redis":
+                    _cache = RedisCache(CACHE_REDIS_URL)
+                else:
+                    raise ValueError(f"Backend de caché no válido: {CACHE_BACKEND}")
+    return _cache
+
+def cached(key, ttl, loader, force_refresh=False, failure_ttl=FAILURE_TTL):
+    """Devuelve el valor en caché o lo obtiene con loader una sola vez por TTL en el host.
+
+    Si otro worker ya está obteniendo la misma clave, se espera a que la publique en
+    lugar de repetir la llamada a la API. Las excepciones de loader se propagan y
+    no se guarda nada en caché, pero durante failure_ttl segundos las demás llamadas
+    lanzan CacheLoadError sin volver a consultar la API. Los errores de la caché
+    (archivo bloqueado, Redis caído) cuentan como un fallo de caché: el dato se
+    obtiene con loader.
+    """
+    cache = get_cache()
+    failure_key = f"failed:{key}"
+    deadline = time.time() + LOCK_TIMEOUT
+
+    while True:
+        try:
+            if not force_refresh:
+                value = cache.get(key, ttl)
+                if value is not None:
+                    return value
+            failure = cache.get(failure_key, failure_ttl) if failure_ttl else None
+            acquired = failure is None and cache.acquire(key, LOCK_TIMEOUT)
+        except Exception as e:
+            print(f"Error en la caché para {key}: {e}")
+            return loader()
+
+        if failure is not None:
+            raise CacheLoadError(failure)
+
+        if acquired:
+            try:
+                # Otro worker pudo publicar el valor (o el fallo) entre la lectura y la reserva
+                if not force_refresh:
+                    value = _cache_call(cache.get, key, ttl)
+                    if value is not None:
+                        return value
+                if failure_ttl:
+                    failure = _cache_call(cache.get, failure_key, failure_ttl)
+                    if failure is not None:
+                        raise CacheLoadError(failure)
+                try:
+                    value = loader()
+                except Exception as e:
+                    if failure_ttl:
+                        _cache_call(cache.set, failure_key, f"{type(e).__name__}: {e}")
+                    raise
+                _cache_call(cache.set, key, value)
+                return value
+            finally:
+                _cache_call(cache.release, key)
+
+        # El worker que tiene la reserva tarda demasiado: obtener el dato directamente
+        if time.time() >= deadline:
+            return loader()
+
+        time.sleep(POLL_INTERVAL)
+
+def _cache_call(method, *args):
+    """Ejecuta una operación de la caché sin propagar sus errores"""
+    try:
+        return method(*args)
+    except Exception as e:
+        print(f"Error en la caché para {args[0]}: {e}")
+        return None
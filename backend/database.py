@@ -1,14 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import create_engine, inspect, Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import os
 from datetime import datetime
 from passlib.context import CryptContext
 
-# Crear el directorio data si no existe
-os.makedirs("data", exist_ok=True)
-
 # Configurar la base de datos SQLite
+# create_engine no abre ninguna conexión: el archivo se crea con init_db()
 SQLALCHEMY_DATABASE_URL = "sqlite:///./data/portfolio.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -54,8 +52,62 @@ class PriceHistoryModel(Base):
     price = Column(Float)
     date = Column(DateTime, index=True)
 
-# Crear las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
+# Definir el modelo ORM para el valor de cierre diario del portfolio de cada usuario
+class PortfolioDailyValueModel(Base):
+    __tablename__ = "portfolio_daily_value"
+    # El índice único (user_id, date) permite leer un rango de días con un solo recorrido
+    __table_args__ = (UniqueConstraint("user_id", "date", name="uq_portfolio_daily_value_user_date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    value = Column(Float, nullable=False)
+    # False si algún activo no tenía cierre real y se valoró a su último precio de transacción
+    is_complete = Column(Boolean, nullable=False, default=True)
+    # Cuándo se calculó el día por primera vez: los incompletos se reintentan por un tiempo limitado
+    computed_at = Column(DateTime, nullable=False, default=datetime.now)
+
+# Definir el modelo ORM para el estado de los lotes abiertos (FIFO) de cada posición
+class PositionLotsModel(Base):
+    __tablename__ = "position_lots"
+    __table_args__ = (UniqueConstraint("user_id", "ticker", "asset_type", name="uq_position_lots_user_asset"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    ticker = Column(String, nullable=False)
+    asset_type = Column(String, nullable=False)
+    # Sumas acumuladas de cantidad y costo por lote, serializadas como arrays de floats
+    lot_quantities = Column(LargeBinary, nullable=False)
+    lot_costs = Column(LargeBinary, nullable=False)
+    consumed_quantity = Column(Float, nullable=False, default=0)
+    realized_pnl = Column(Float, nullable=False, default=0)
+    # Última transacción aplicada, para procesar solo las nuevas
+    last_transaction_id = Column(Integer, nullable=False, default=0)
+    last_transaction_date = Column(DateTime)
+
+# Definir el modelo ORM para las cotizaciones diarias de monedas (unidades por 1 USD)
+class FxRateModel(Base):
+    __tablename__ = "fx_rates"
+    __table_args__ = (UniqueConstraint("currency", "date", name="uq_fx_rates_currency_date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    rate = Column(Float, nullable=False)
+
+# Crear el directorio data y las tablas en la base de datos.
+# Se ejecuta como paso explícito de despliegue (python database.py), no al importar
+def init_db():
+    os.makedirs("data", exist_ok=True)
+    # Los valores diarios son datos derivados: con un esquema anterior la tabla se
+    # descarta y se vuelve a calcular a partir de las transacciones
+    table = PortfolioDailyValueModel.__table__
+    inspector = inspect(engine)
+    if inspector.has_table(table.name):
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        if not {column.name for column in table.columns} <= existing:
+            table.drop(bind=engine)
+    Base.metadata.create_all(bind=engine)
 
 # Función para obtener una sesión de base de datos
 def get_db():
@@ -70,4 +122,9 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+# Inicializar el esquema de la base de datos
+if __name__ == "__main__":
+    init_db()
+    print("Base de datos inicializada")
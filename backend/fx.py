@@ -0,0 +1,155 @@
+"""Conversión de valores en USD a otras monedas con cotizaciones diarias guardadas.
+
+Las cotizaciones se guardan en la tabla fx_rates y se actualizan como mucho una
+vez por FX_REFRESH_TTL para todo el host: la actualización pasa por la caché
+compartida, así que la hace un solo worker y la aprovechan todos los usuarios.
+Solo se consultan las monedas de SUPPORTED_CURRENCIES, y tras un fallo de la API
+no se reintenta hasta que pase FX_FAILURE_TTL. Si se piden fechas anteriores a la
+primera cotización guardada, el historial se extiende hacia atrás por años completos.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from api_services import get_fx_historical_rates
+from cache import cached
+from database import SessionLocal, FxRateModel
+
+BASE_CURRENCY = "USD"
+# Monedas con cotización diaria en Yahoo Finance ("EUR=X", "ARS=X", ...)
+SUPPORTED_CURRENCIES = frozenset({
+    "USD", "EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "NZD", "CNY", "HKD", "SGD",
+    "SEK", "NOK", "DKK", "PLN", "ILS", "TRY", "ZAR", "INR", "KRW",
+    "MXN", "BRL", "ARS", "CLP", "COP", "PEN", "UYU",
+})
+# Cada cuánto se vuelve a consultar la cotización de una moneda, en segundos
+FX_REFRESH_TTL = 3600
+# Tiempo sin reintentar la descarga después de un fallo, en segundos
+FX_FAILURE_TTL = 300
+# Historial que se descarga la primera vez que se usa una moneda
+FX_HISTORY_DAYS = 5 * 365
+
+
+def refresh_fx_rates(currency):
+    """Descarga las cotizaciones que falten desde el último día guardado hasta hoy"""
+    today = date.today()
+    db = SessionLocal()
+    try:
+        last_date = db.query(FxRateModel.date).filter(
+            FxRateModel.currency == currency
+        ).order_by(FxRateModel.date.desc()).limit(1).scalar()
+
+        # El último día guardado se vuelve a pedir porque pudo cambiar durante ese día
+        start_date = last_date or today - timedelta(days=FX_HISTORY_DAYS)
+        history = get_fx_historical_rates(currency, start_date, today)
+
+        db.query(FxRateModel).filter(
+            FxRateModel.currency == currency,
+            FxRateModel.date >= start_date
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(FxRateModel, [
+            {'currency': currency, 'date': date.fromisoformat(day), 'rate': rate}
+            for day, rate in dict(zip(history['dates'], history['values'])).items()
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return True
+
+def extend_fx_history(currency, start_date):
+    """Descarga las cotizaciones desde start_date hasta el día anterior a la primera guardada"""
+    db = SessionLocal()
+    try:
+        first_date = db.query(func.min(FxRateModel.date)).filter(
+            FxRateModel.currency == currency
+        ).scalar()
+        if first_date is None or start_date >= first_date:
+            return True
+        try:
+            history = get_fx_historical_rates(currency, start_date, first_date - timedelta(days=1))
+        except ValueError:
+            # Yahoo Finance no tiene cotizaciones tan antiguas para esta moneda
+            return True
+
+        rows = [
+            {'currency': currency, 'date': date.fromisoformat(day), 'rate': rate}
+            for day, rate in dict(zip(history['dates'], history['values'])).items()
+            if date.fromisoformat(day) < first_date
+        ]
+        if rows:
+            # Otro worker pudo extender el mismo rango al mismo tiempo
+            db.execute(insert(FxRateModel).on_conflict_do_nothing(), rows)
+        db.commit()
+    finally:
+        db.close()
+    return True
+
+def ensure_fx_rates(currency):
+    """Actualiza las cotizaciones de la moneda si pasó más de FX_REFRESH_TTL desde la última vez"""
+    try:
+        # Tras un fallo no se reintenta la descarga hasta que pase FX_FAILURE_TTL
+        cached(
+            f"fx_refresh_{currency}",
+            FX_REFRESH_TTL,
+            lambda: refresh_fx_rates(currency),
+            failure_ttl=FX_FAILURE_TTL
+        )
+    except Exception as e:
+        # Si la API falla se usan las cotizaciones ya guardadas
+        print(f"Error al actualizar cotizaciones de {currency}: {e}")
+
+def get_fx_rates(db: Session, currency, dates):
+    """Cotización de cada fecha (unidades de currency por 1 USD) como array de NumPy.
+
+    Los días sin cotización (fines de semana, feriados) usan la última anterior; los
+    anteriores a la primera cotización disponible quedan en NaN. Lanza ValueError
+    si la moneda no está soportada o no tiene cotizaciones guardadas.
+    """
+    import numpy as np
+
+    if currency == BASE_CURRENCY:
+        return np.ones(len(dates))
+    if currency not in SUPPORTED_CURRENCIES:
+        raise ValueError(f"Moneda no soportada: {currency}")
+
+    ensure_fx_rates(currency)
+    start_date, end_date = min(dates), max(dates)
+
+    first_date = db.query(func.min(FxRateModel.date)).filter(
+        FxRateModel.currency == currency
+    ).scalar()
+    if first_date is None:
+        raise ValueError(f"Sin cotizaciones para {currency}")
+    if start_date < first_date:
+        # Se pide desde el 1 de enero para no repetir la descarga con cada rango distinto
+        history_start = date(start_date.year, 1, 1)
+        try:
+            cached(
+                f"fx_history_{currency}_{history_start.isoformat()}",
+                FX_REFRESH_TTL,
+                lambda: extend_fx_history(currency, history_start),
+                failure_ttl=FX_FAILURE_TTL
+            )
+        except Exception as e:
+            print(f"Error al extender cotizaciones de {currency}: {e}")
+
+    rows = db.query(FxRateModel.date, FxRateModel.rate).filter(
+        FxRateModel.currency == currency,
+        FxRateModel.date >= start_date,
+        FxRateModel.date <= end_date
+    ).order_by(FxRateModel.date).all()
+    previous = db.query(FxRateModel.date, FxRateModel.rate).filter(
+        FxRateModel.currency == currency,
+        FxRateModel.date < start_date
+    ).order_by(FxRateModel.date.desc()).first()
+    if previous is not None:
+        rows.insert(0, previous)
+    if not rows:
+        return np.full(len(dates), np.nan)
+
+    rate_dates = np.array([row.date for row in rows], dtype='datetime64[D]')
+    rates = np.array([row.rate for row in rows])
+    index = np.searchsorted(rate_dates, np.array(dates, dtype='datetime64[D]'), side='right') - 1
+    return np.where(index >= 0, rates[np.maximum(index, 0)], np.nan)
@@ -0,0 +1,175 @@
+"""Motor de lotes FIFO con ganancias realizadas y no realizadas.
+
+El estado de cada posición (usuario, ticker, tipo de activo) se guarda en la tabla
+position_lots y solo se aplican las transacciones nuevas en cada consulta. Si llega
+una transacción con fecha anterior a la última aplicada, esa posición se recalcula
+desde cero para respetar el orden FIFO.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import TransactionModel, PositionLotsModel
+
+# Cantidades menores se consideran cero (restos de redondeo al vender todo)
+QUANTITY_EPSILON = 1e-9
+
+class LotBook:
+    """Lotes abiertos de una posición en orden FIFO.
+
+    Guarda las sumas acumuladas de cantidad y costo de los lotes comprados, así una
+    venta encuentra con búsqueda binaria hasta qué lote consume y calcula su costo
+    en O(log n) sin recorrer los lotes.
+    """
+
+    def __init__(self, cum_quantity=None, cum_cost=None, consumed=0.0, realized_pnl=0.0):
+        self.cum_quantity = cum_quantity if cum_quantity is not None else array('d')
+        self.cum_cost = cum_cost if cum_cost is not None else array('d')
+        # Cantidad ya vendida desde el inicio de los lotes
+        self.consumed = consumed
+        self.realized_pnl = realized_pnl
+
+    @property
+    def total_quantity(self):
+        return self.cum_quantity[-1] if self.cum_quantity else 0.0
+
+    @property
+    def open_quantity(self):
+        quantity = self.total_quantity - self.consumed
+        return quantity if quantity > QUANTITY_EPSILON else 0.0
+
+    @property
+    def open_cost(self):
+        if not self.cum_cost:
+            return 0.0
+        return max(self.cum_cost[-1] - self._cost_of_first(self.consumed), 0.0)
+
+    def _cost_of_first(self, units):
+        """Costo de las primeras `units` unidades compradas"""
+        i = bisect_left(self.cum_quantity, units)
+        if i >= len(self.cum_quantity):
+            return self.cum_cost[-1] if self.cum_cost else 0.0
+        prev_quantity = self.cum_quantity[i - 1] if i else 0.0
+        prev_cost = self.cum_cost[i - 1] if i else 0.0
+        lot_price = (self.cum_cost[i] - prev_cost) / (self.cum_quantity[i] - prev_quantity)
+        return prev_cost + (units - prev_quantity) * lot_price
+
+    def buy(self, quantity, price):
+        self.cum_quantity.append(self.total_quantity + quantity)
+        self.cum_cost.append((self.cum_cost[-1] if self.cum_cost else 0.0) + quantity * price)
+
+    def sell(self, quantity, price):
+        """Vende desde los lotes más antiguos y devuelve la ganancia realizada.
+
+        Si se vende más de lo que hay abierto, solo se realiza la parte disponible.
+        """
+        sold = min(quantity, self.open_quantity)
+        cost = self._cost_of_first(self.consumed + sold) - self._cost_of_first(self.consumed)
+        self.consumed += sold
+        realized = sold * price - cost
+        self.realized_pnl += realized
+        return realized
+
+    def apply(self, quantity, price):
+        """Aplica una transacción: cantidad positiva es compra, negativa es venta"""
+        if quantity > 0:
+            self.buy(quantity, price)
+        elif quantity < 0:
+            self.sell(-quantity, price)
+
+    def compact(self):
+        """Descarta los lotes ya vendidos por completo"""
+        i = bisect_right(self.cum_quantity, self.consumed)
+        if i == 0:
+            return
+        base_quantity = self.cum_quantity[i - 1]
+        base_cost = self.cum_cost[i - 1]
+        self.cum_quantity = array('d', (q - base_quantity for q in self.cum_quantity[i:]))
+        self.cum_cost = array('d', (c - base_cost for c in self.cum_cost[i:]))
+        self.consumed = max(self.consumed - base_quantity, 0.0)
+
+    @classmethod
+    def from_model(cls, row):
+        cum_quantity = array('d')
+        cum_quantity.frombytes(row.lot_quantities)
+        cum_cost = array('d')
+        cum_cost.frombytes(row.lot_costs)
+        return cls(cum_quantity, cum_cost, row.consumed_quantity, row.realized_pnl)
+
+    def to_model(self, row):
+        self.compact()
+        row.lot_quantities = self.cum_quantity.tobytes()
+        row.lot_costs = self.cum_cost.tobytes()
+        row.consumed_quantity = self.consumed
+        row.realized_pnl = self.realized_pnl
+
+
+def replay(transactions):
+    """Construye un LotBook aplicando las transacciones en orden"""
+    book = LotBook()
+    for tx in sorted(transactions, key=lambda tx: (tx.transaction_date, tx.id)):
+        book.apply(tx.quantity, tx.price)
+    return book
+
+def update_positions(db: Session, user_id):
+    """Aplica las transacciones nuevas del usuario y devuelve {(ticker, asset_type): LotBook}"""
+    rows = {
+        (row.ticker, row.asset_type): row
+        for row in db.query(PositionLotsModel).filter(PositionLotsModel.user_id == user_id)
+    }
+    books = {key: LotBook.from_model(row) for key, row in rows.items()}
+
+    # Solo hace falta leer las transacciones posteriores a la más antigua aplicada
+    watermark = min((row.last_transaction_id for row in rows.values()), default=0)
+    new_transactions = db.query(TransactionModel).filter(
+        TransactionModel.user_id == user_id,
+        TransactionModel.id > watermark
+    ).order_by(TransactionModel.transaction_date, TransactionModel.id).all()
+
+    touched = set()
+    rebuild = set()
+    for tx in new_transactions:
+        key = (tx.ticker, tx.asset_type)
+        row = rows.get(key)
+        if row is not None and tx.id <= row.last_transaction_id:
+            continue
+        if row is None:
+            row = PositionLotsModel(user_id=user_id, ticker=tx.ticker, asset_type=tx.asset_type, last_transaction_id=0)
+            rows[key] = row
+            books[key] = LotBook()
+            db.add(row)
+        elif row.last_transaction_date is not None and tx.transaction_date < row.last_transaction_date:
+            # Transacción con fecha pasada: el orden FIFO cambió
+            rebuild.add(key)
+
+        books[key].apply(tx.quantity, tx.price)
+        row.last_transaction_id = max(row.last_transaction_id, tx.id)
+        if row.last_transaction_date is None or tx.transaction_date > row.last_transaction_date:
+            row.last_transaction_date = tx.transaction_date
+        touched.add(key)
+
+    for key in rebuild:
+        ticker, asset_type = key
+        books[key] = replay(db.query(TransactionModel).filter(
+            TransactionModel.user_id == user_id,
+            TransactionModel.ticker == ticker,
+            TransactionModel.asset_type == asset_type
+        ).all())
+
+    if new_transactions:
+        # Todas las posiciones quedan al día hasta la última transacción leída
+        high = max(tx.id for tx in new_transactions)
+        for row in rows.values():
+            row.last_transaction_id = max(row.last_transaction_id, high)
+        for key in touched:
+            books[key].to_model(rows[key])
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra petición guardó las mismas posiciones al mismo tiempo; el resultado
+            # calculado aquí sigue siendo válido
+            db.rollback()
+
+    return books
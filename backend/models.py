@@ -62,22 +62,63 @@ class PortfolioAsset(BaseModel):
     current_price: float
     price_change_24h: float
     total_value: float
-    profit_loss: float
+    profit_loss: float  # Ganancia no realizada de los lotes abiertos
     profit_loss_percent: float
+    realized_profit_loss: float = 0  # Ganancia realizada por ventas (FIFO)
 
 # Modelo para el resumen del portfolio
 class PortfolioSummary(BaseModel):
     total_value: float
     daily_change_percent: float
     assets: List[PortfolioAsset]
+    realized_profit_loss: float = 0
+    unrealized_profit_loss: float = 0
+    currency: str = "USD"
 
 # Modelo para el historial del portfolio
 class PortfolioHistory(BaseModel):
     dates: List[str]
     values: List[float]
+    currency: str = "USD"
 
 # Modelo para la asignación de activos
 class AssetAllocation(BaseModel):
     ticker: str
     value: float
-    percentage: float
\ No newline at end of file
+    percentage: float
+
+# Modelo para el riesgo de un activo del portfolio
+class AssetRisk(BaseModel):
+    ticker: str
+    asset_type: str
+    weight: float
+    volatility: float
+
+# Modelo para las métricas de riesgo del portfolio
+class PortfolioRisk(BaseModel):
+    days: int
+    benchmark: str
+    volatility: float
+    annual_return: float
+    max_drawdown: float
+    sharpe_ratio: float
+    beta: Optional[float] = None
+    assets: List[AssetRisk]
+    correlation: List[List[float]]
+    # Activos sin precios reales, que no entran en las métricas
+    missing_assets: List[str] = []
+
+# Modelo para una banda de percentil de la proyección
+class ProjectionBand(BaseModel):
+    percentile: float
+    values: List[float]
+
+# Modelo para la proyección Monte Carlo del portfolio
+class PortfolioProjection(BaseModel):
+    initial_value: float
+    paths: int
+    seed: Optional[int] = None
+    dates: List[str]
+    bands: List[ProjectionBand]
+    # Activos sin precios reales, proyectados con su valor actual constante
+    missing_assets: List[str] = []
@@ -0,0 +1,92 @@
+"""Proyección Monte Carlo del valor del portfolio.
+
+Simula miles de caminos correlacionados para las posiciones actuales en un solo
+cálculo vectorizado: la deriva y la covarianza se estiman con los rendimientos
+logarítmicos diarios de la caché de risk.get_returns_matrix y los shocks se
+correlacionan con la factorización de Cholesky de la covarianza.
+"""
+import numpy as np
+
+from risk import MissingPricesError, get_returns_matrix
+
+# Memoria máxima de una simulación: el resultado [camino, día] más los tensores
+# intermedios [camino, día, activo] de cada bloque
+DEFAULT_MEMORY_BUDGET = 128 * 1024 * 1024
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def estimate_parameters(returns):
+    """Deriva y covarianza diarias de los rendimientos logarítmicos [día, activo]"""
+    log_returns = np.log1p(returns)
+    mu = log_returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+    return mu, cov
+
+def correlation_factor(cov):
+    """Matriz L con L @ L.T == cov; tolera covarianzas semidefinidas"""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        # Activos con precio constante o perfectamente correlacionados
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+def simulate_paths(values, mu, cov, horizon, paths, seed=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Valor del portfolio [camino, día] para `horizon` días a partir de los valores actuales por activo.
+
+    Los caminos se simulan por bloques para que el resultado y los tensores
+    intermedios no superen memory_budget bytes (None: un solo bloque). El resultado
+    no depende del tamaño de bloque: los números aleatorios se generan en el mismo orden.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=float)
+    factor = correlation_factor(cov)
+    assets = len(values)
+
+    # Por bloque viven dos tensores float64 [bloque, día, activo]: shocks y rendimientos
+    bytes_per_path = 2 * horizon * assets * 8
+    if memory_budget is None:
+        chunk = paths
+    else:
+        # El resultado float32 ocupa su parte del presupuesto durante toda la simulación
+        available = memory_budget - paths * horizon * 4
+        if available < bytes_per_path:
+            raise ValueError(
+                f"El presupuesto de memoria ({memory_budget} bytes) no alcanza para {paths} caminos de {horizon} días"
+            )
+        chunk = min(paths, available // bytes_per_path)
+
+    result = np.empty((paths, horizon), dtype=np.float32)
+    for start in range(0, paths, chunk):
+        size = min(chunk, paths - start)
+        growth = rng.standard_normal((size, horizon, assets)) @ factor.T
+        growth += mu
+        np.cumsum(growth, axis=1, out=growth)
+        np.exp(growth, out=growth)
+        result[start:start + size] = growth @ values
+    return result
+
+def percentile_bands(path_values, percentiles=DEFAULT_PERCENTILES):
+    """Percentiles del valor del portfolio para cada día: matriz [percentil, día]"""
+    return np.percentile(path_values, percentiles, axis=0)
+
+def project_portfolio(holdings, horizon, paths, history_days=365, seed=None,
+                      memory_budget=DEFAULT_MEMORY_BUDGET, percentiles=DEFAULT_PERCENTILES):
+    """Bandas de percentiles para holdings = {(ticker, tipo): valor actual}.
+
+    Devuelve (bandas, activos sin precios reales). Esos activos no se simulan: su
+    valor actual se suma constante a todos los caminos.
+    """
+    matrix = get_returns_matrix(list(holdings), history_days)
+    column = {asset: i for i, asset in enumerate(matrix['assets'])}
+    missing = [asset for asset in holdings if asset in set(matrix['missing'])]
+    assets = [asset for asset in holdings if asset not in missing]
+    if not assets:
+        raise MissingPricesError(matrix)
+    returns = matrix['returns'][:, [column[asset] for asset in assets]]
+
+    mu, cov = estimate_parameters(returns)
+    values = np.array([holdings[asset] for asset in assets])
+    path_values = simulate_paths(values, mu, cov, horizon, paths, seed, memory_budget)
+    path_values += sum(holdings[asset] for asset in missing)
+    return percentile_bands(path_values, percentiles), missing
@@ -0,0 +1,127 @@
+"""Métricas de riesgo del portfolio calculadas con NumPy sobre la matriz de precios diarios.
+
+Los rendimientos diarios alineados de cada conjunto de activos se guardan en la
+caché compartida por (activos, ventana), así las cargas repetidas del dashboard
+solo recalculan las métricas, que son unas pocas operaciones vectoriales. Los
+activos sin precios reales se informan y quedan fuera de las métricas.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from api_services import get_price_matrix
+from cache import cached
+
+# Los precios están alineados por días calendario (las criptomonedas cotizan todos los días)
+PERIODS_PER_YEAR = 365
+# Vigencia de la matriz de rendimientos en caché, en segundos
+RETURNS_CACHE_TTL = 600
+
+
+class MissingPricesError(ValueError):
+    """Algún activo no tiene precios reales; lleva la matriz calculada para usarla sin guardarla en caché"""
+
+    def __init__(self, matrix):
+        super().__init__("Sin precios reales para: " + ", ".join(ticker for ticker, _ in matrix['missing']))
+        self.matrix = matrix
+
+def get_returns_matrix(assets, days):
+    """Rendimientos diarios alineados [día, activo] de los últimos `days` días.
+
+    Devuelve {'assets': lista ordenada de (ticker, tipo), 'returns': matriz,
+    'missing': activos sin historial real o sin precio actual real}. Si falta alguno
+    la matriz no se guarda en caché: una caída de la API no debe servirse como
+    rendimientos planos durante RETURNS_CACHE_TTL.
+    """
+    assets = sorted(set(assets))
+    cache_key = f"returns_{days}_" + ",".join(f"{asset_type}:{ticker}" for ticker, asset_type in assets)
+
+    def load():
+        end_date = date.today()
+        prices = get_price_matrix(assets, end_date - timedelta(days=days), end_date)
+        missing = [
+            asset for column, asset in enumerate(assets)
+            if np.isnan(prices[:, column]).all() or np.isnan(prices[-1, column])
+        ]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = prices[1:] / prices[:-1] - 1
+        # Días antes del primer cierre (NaN) o precios en 0 no deben generar rendimientos inválidos
+        returns[~np.isfinite(returns)] = 0.0
+        matrix = {'assets': assets, 'returns': returns, 'missing': missing}
+        if missing:
+            raise MissingPricesError(matrix)
+        return matrix
+
+    try:
+        # Sin marca de fallo: cada reintento solo relee precios que ya están en caché
+        return cached(cache_key, RETURNS_CACHE_TTL, load, failure_ttl=0)
+    except MissingPricesError as e:
+        return e.matrix
+
+def max_drawdown(returns):
+    """Mayor caída desde un máximo de la serie de valor acumulado"""
+    if len(returns) == 0:
+        return 0.0
+    wealth = np.cumprod(1 + returns)
+    peaks = np.maximum.accumulate(np.concatenate(([1.0], wealth)))[1:]
+    return float((wealth / peaks - 1).min())
+
+def compute_risk_metrics(returns, weights, benchmark_returns=None, risk_free_rate=0.0):
+    """Volatilidad, drawdown máximo, Sharpe, beta y correlaciones a partir de la matriz de rendimientos"""
+    portfolio_returns = returns @ weights
+
+    volatility = float(portfolio_returns.std(ddof=1) * np.sqrt(PERIODS_PER_YEAR)) if len(returns) > 1 else 0.0
+    annual_return = float(portfolio_returns.mean() * PERIODS_PER_YEAR) if len(returns) else 0.0
+    sharpe_ratio = (annual_return - risk_free_rate) / volatility if volatility > 0 else 0.0
+
+    beta = None
+    if benchmark_returns is not None and len(returns) > 1:
+        benchmark_variance = benchmark_returns.var(ddof=1)
+        if benchmark_variance > 0:
+            beta = float(np.cov(portfolio_returns, benchmark_returns)[0, 1] / benchmark_variance)
+
+    asset_volatility = returns.std(axis=0, ddof=1) * np.sqrt(PERIODS_PER_YEAR) if len(returns) > 1 else np.zeros(returns.shape[1])
+    if returns.shape[1] > 1 and len(returns) > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.corrcoef(returns, rowvar=False)
+        # Activos con precio constante no tienen correlación definida
+        correlation = np.nan_to_num(correlation)
+    else:
+        correlation = np.ones((returns.shape[1], returns.shape[1]))
+
+    return {
+        'volatility': volatility,
+        'annual_return': annual_return,
+        'max_drawdown': max_drawdown(portfolio_returns),
+        'sharpe_ratio': sharpe_ratio,
+        'beta': beta,
+        'asset_volatility': asset_volatility.tolist(),
+        'correlation': correlation.tolist()
+    }
+
+def compute_portfolio_risk(holdings, days, benchmark, risk_free_rate=0.0):
+    """Métricas de riesgo para holdings = {(ticker, tipo): valor actual}.
+
+    Los activos sin precios reales se devuelven en 'missing' y no entran en las
+    métricas; si ninguno tiene precios se lanza MissingPricesError.
+    """
+    benchmark_asset = (benchmark, "stock")
+    matrix = get_returns_matrix(list(holdings) + [benchmark_asset], days)
+    column = {asset: i for i, asset in enumerate(matrix['assets'])}
+    returns = matrix['returns']
+    missing = set(matrix['missing'])
+
+    assets = [asset for asset in holdings if asset not in missing]
+    if not assets:
+        raise MissingPricesError(matrix)
+
+    total_value = sum(holdings[asset] for asset in assets)
+    weights = np.array([holdings[asset] / total_value for asset in assets])
+    asset_returns = returns[:, [column[asset] for asset in assets]]
+    benchmark_returns = None if benchmark_asset in missing else returns[:, column[benchmark_asset]]
+
+    metrics = compute_risk_metrics(asset_returns, weights, benchmark_returns, risk_free_rate)
+    metrics['assets'] = assets
+    metrics['weights'] = weights.tolist()
+    metrics['missing'] = [asset for asset in holdings if asset in missing]
+    return metrics
@@ -0,0 +1,223 @@
+"""Valores de cierre diarios del portfolio (tabla portfolio_daily_value).
+
+Los días ya cerrados no cambian, así que se calculan una sola vez y se guardan.
+Si a un activo le falta el cierre real de un día (API caída, ticker no soportado)
+se valora al precio de su última transacción y el día queda incompleto: se vuelve a
+calcular como mucho cada SNAPSHOT_RETRY_INTERVAL hasta que pase SNAPSHOT_RETRY_WINDOW.
+El job diario agrega solo el último día cerrado de cada usuario:
+    python snapshots.py
+(por ejemplo desde cron, poco después de medianoche). Con muchos usuarios,
+valuation_job.py hace el mismo trabajo repartido entre varios procesos.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, TransactionModel, UserModel, PortfolioDailyValueModel
+from api_services import get_daily_closes
+from cache import cached
+
+# Cada cuánto, como mucho, se recalculan los días incompletos de un usuario, en segundos
+SNAPSHOT_RETRY_INTERVAL = 600
+# Tiempo durante el que se reintenta un día incompleto antes de darlo por definitivo
+SNAPSHOT_RETRY_WINDOW = timedelta(days=3)
+
+
+def group_by_asset(transactions):
+    """Agrupa las transacciones por (ticker, tipo de activo)"""
+    assets = {}
+    for tx in transactions:
+        assets.setdefault((tx.ticker, tx.asset_type), []).append(tx)
+    return assets
+
+def at_close(tx_dates, running, day_ends):
+    """Valor de `running` (uno por transacción, ordenadas por fecha) al cierre de cada día; 0 antes de la primera"""
+    import numpy as np
+
+    # Una transacción cuenta para el cierre de un día si ocurrió antes del día siguiente
+    count = np.searchsorted(tx_dates, day_ends, side='left')
+    return np.where(count > 0, np.asarray(running, dtype=float)[np.maximum(count - 1, 0)], 0.0)
+
+def quantities_at_close(tx_dates, quantities, day_ends):
+    """Cantidad de un activo al cierre de cada día a partir de sus transacciones ordenadas por fecha"""
+    import numpy as np
+
+    return at_close(tx_dates, np.cumsum(quantities), day_ends)
+
+def compute_daily_values(transactions, start_date, end_date):
+    """Calcula el valor de cierre del portfolio para cada día entre start_date y end_date (inclusive).
+
+    Devuelve (días, valores, completos): en un día incompleto algún activo que se
+    tenía no tenía cierre real y se valoró al precio de su última transacción.
+    """
+    import numpy as np
+    import pandas as pd
+
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+    values = np.zeros(len(days))
+    complete = np.ones(len(days), dtype=bool)
+    if len(days) == 0:
+        return days, values, complete
+
+    day_ends = (days + pd.Timedelta(days=1)).values
+
+    for (ticker, asset_type), asset_transactions in group_by_asset(transactions).items():
+        asset_transactions = sorted(asset_transactions, key=lambda tx: tx.transaction_date)
+        tx_dates = pd.to_datetime([tx.transaction_date for tx in asset_transactions]).values
+
+        # Cantidad que tenía el usuario al cierre de cada día
+        quantity = quantities_at_close(tx_dates, [tx.quantity for tx in asset_transactions], day_ends)
+        held = quantity > 0
+        if not held.any():
+            continue
+
+        day_prices = get_daily_closes(ticker, asset_type, days)
+        missing = np.isnan(day_prices)
+        if missing.any():
+            complete &= ~(held & missing)
+            last_prices = at_close(tx_dates, [tx.price for tx in asset_transactions], day_ends)
+            day_prices = np.where(missing, last_prices, day_prices)
+        values += np.where(held, quantity * day_prices, 0.0)
+
+    return days, values, complete
+
+def retry_due(user_id):
+    """True como mucho una vez por SNAPSHOT_RETRY_INTERVAL para cada usuario en todo el host"""
+    due = []
+    cached(f"snapshot_retry_{user_id}", SNAPSHOT_RETRY_INTERVAL, lambda: due.append(True) or True)
+    return bool(due)
+
+def ensure_snapshots(db: Session, user_id, transactions=None):
+    """Agrega los días cerrados que falten hasta ayer y recalcula los incompletos que toque reintentar"""
+    yesterday = date.today() - timedelta(days=1)
+
+    last_date = db.query(func.max(PortfolioDailyValueModel.date)).filter(
+        PortfolioDailyValueModel.user_id == user_id
+    ).scalar()
+    retryable = db.query(PortfolioDailyValueModel.id, PortfolioDailyValueModel.date).filter(
+        PortfolioDailyValueModel.user_id == user_id,
+        PortfolioDailyValueModel.is_complete.is_(False),
+        PortfolioDailyValueModel.computed_at >= datetime.now() - SNAPSHOT_RETRY_WINDOW
+    ).order_by(PortfolioDailyValueModel.date).all()
+    if retryable and not retry_due(user_id):
+        retryable = []
+    if last_date is not None and last_date >= yesterday and not retryable:
+        return 0
+
+    if transactions is None:
+        transactions = db.query(TransactionModel).filter(
+            TransactionModel.user_id == user_id
+        ).all()
+    if not transactions:
+        return 0
+
+    if last_date is None:
+        start_date = min(tx.transaction_date for tx in transactions).date()
+    else:
+        start_date = last_date + timedelta(days=1)
+    if retryable:
+        start_date = min(start_date, retryable[0].date)
+    if start_date > yesterday:
+        return 0
+
+    days, values, complete = compute_daily_values(transactions, start_date, yesterday)
+    updates = []
+    for row in retryable:
+        offset = (row.date - start_date).days
+        if complete[offset]:
+            updates.append({'id': row.id, 'value': float(values[offset]), 'is_complete': True})
+    inserts = [
+        {'user_id': user_id, 'date': day.date(), 'value': float(value), 'is_complete': bool(is_complete)}
+        for day, value, is_complete in zip(days, values, complete)
+        if last_date is None or day.date() > last_date
+    ]
+    if not updates and not inserts:
+        return 0
+
+    try:
+        db.bulk_update_mappings(PortfolioDailyValueModel, updates)
+        db.bulk_insert_mappings(PortfolioDailyValueModel, inserts)
+        # Con las filas ya escritas la base queda reservada para esta transacción: una
+        # transacción nueva o se ve en esta consulta o se confirma (e invalida) después
+        last_transaction_id = db.query(func.max(TransactionModel.id)).filter(
+            TransactionModel.user_id == user_id
+        ).scalar()
+        if last_transaction_id != max(tx.id for tx in transactions):
+            # Se agregó una transacción después de cargar las usadas para calcular
+            db.rollback()
+            return 0
+        db.commit()
+    except IntegrityError:
+        # Otra petición agregó los mismos días al mismo tiempo
+        db.rollback()
+        return 0
+    return len(updates) + len(inserts)
+
+def invalidate_snapshots(db: Session, user_id, from_date):
+    """Elimina los valores guardados desde from_date para que se recalculen"""
+    db.query(PortfolioDailyValueModel).filter(
+        PortfolioDailyValueModel.user_id == user_id,
+        PortfolioDailyValueModel.date >= from_date
+    ).delete(synchronize_session=False)
+    db.commit()
+
+def backfill_snapshots(user_id):
+    """Recalcula los días eliminados por invalidate_snapshots con una sesión propia"""
+    db = SessionLocal()
+    try:
+        ensure_snapshots(db, user_id)
+    finally:
+        db.close()
+
+def get_snapshot_values(db: Session, user_id, start_date, end_date):
+    """Devuelve {fecha: valor} de los días guardados entre start_date y end_date (inclusive)"""
+    rows = db.query(PortfolioDailyValueModel.date, PortfolioDailyValueModel.value).filter(
+        PortfolioDailyValueModel.user_id == user_id,
+        PortfolioDailyValueModel.date >= start_date,
+        PortfolioDailyValueModel.date <= end_date
+    ).order_by(PortfolioDailyValueModel.date).all()
+    return {row.date: row.value for row in rows}
+
+def get_daily_values(db: Session, user_id, start_date, end_date):
+    """Devuelve {fecha: valor} entre start_date y end_date (inclusive) desde la primera transacción.
+
+    Los días se leen de los valores guardados; si falta alguno (por ejemplo, porque
+    otra petición acaba de invalidarlo) se calcula sin guardarlo.
+    """
+    ensure_snapshots(db, user_id)
+    values = get_snapshot_values(db, user_id, start_date, end_date)
+
+    first_transaction = db.query(func.min(TransactionModel.transaction_date)).filter(
+        TransactionModel.user_id == user_id
+    ).scalar()
+    if first_transaction is None:
+        return values
+    day = max(start_date, first_transaction.date())
+    while day <= end_date and day in values:
+        day += timedelta(days=1)
+    if day > end_date:
+        return values
+
+    transactions = db.query(TransactionModel).filter(TransactionModel.user_id == user_id).all()
+    days, computed, _ = compute_daily_values(transactions, day, end_date)
+    for computed_day, value in zip(days, computed):
+        values.setdefault(computed_day.date(), float(value))
+    return values
+
+def run_daily_job():
+    """Agrega el último día cerrado al historial de todos los usuarios"""
+    db = SessionLocal()
+    try:
+        user_ids = [user_id for (user_id,) in db.query(UserModel.id).all()]
+        for user_id in user_ids:
+            added = ensure_snapshots(db, user_id)
+            print(f"Usuario {user_id}: {added} días agregados")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    started = datetime.now()
+    run_daily_job()
+    print(f"Job diario completado en {(datetime.now() - started).total_seconds():.1f}s")
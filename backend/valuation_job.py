@@ -0,0 +1,238 @@
+"""Job nocturno de valoración de todos los portfolios en paralelo.
+
+Hace el mismo trabajo que snapshots.run_daily_job (agregar los días cerrados que
+falten a portfolio_daily_value) y además calcula el valor actual de cada usuario,
+repartiendo los usuarios entre varios procesos:
+    python valuation_job.py --workers 4
+
+- Los precios se obtienen una sola vez en el proceso principal y se comparten con
+  los workers como una matriz [día, activo] en memoria compartida.
+- Cada worker recorre las transacciones de su partición con un cursor por bloques,
+  sin crear objetos ORM.
+- Los valores calculados se escriben en lotes desde el proceso principal, así SQLite
+  solo tiene un escritor. Los usuarios que agregaron transacciones mientras corría
+  el job se descartan al escribir, como en snapshots.ensure_snapshots.
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import SQLALCHEMY_DATABASE_URL, TransactionModel, PortfolioDailyValueModel
+from api_services import get_price_matrix
+from snapshots import at_close, quantities_at_close
+
+# Filas leídas por bloque del cursor de transacciones
+CHUNK_SIZE = 1000
+# Filas por sentencia al escribir los valores diarios
+WRITE_BATCH_SIZE = 5000
+# Particiones por worker, para repartir mejor usuarios con muchas transacciones
+PARTITIONS_PER_WORKER = 4
+
+
+def last_transaction_ids(conn):
+    """Devuelve {user_id: id de su última transacción}"""
+    return dict(conn.execute(
+        select(TransactionModel.user_id, func.max(TransactionModel.id))
+        .group_by(TransactionModel.user_id)
+    ).all())
+
+def plan_users(engine, today):
+    """Devuelve {user_id: primer día sin valor guardado}, {user_id: id de su última
+    transacción} y la lista de activos con transacciones"""
+    with engine.connect() as conn:
+        first_transaction = dict(conn.execute(
+            select(TransactionModel.user_id, func.min(TransactionModel.transaction_date))
+            .group_by(TransactionModel.user_id)
+        ).all())
+        transaction_ids = last_transaction_ids(conn)
+        last_snapshot = dict(conn.execute(
+            select(PortfolioDailyValueModel.user_id, func.max(PortfolioDailyValueModel.date))
+            .group_by(PortfolioDailyValueModel.user_id)
+        ).all())
+        assets = [tuple(row) for row in conn.execute(
+            select(TransactionModel.ticker, TransactionModel.asset_type).distinct()
+        ).all()]
+
+    user_starts = {}
+    for user_id, first_date in first_transaction.items():
+        if user_id in last_snapshot:
+            start_date = last_snapshot[user_id] + timedelta(days=1)
+        else:
+            start_date = first_date.date()
+        # Si ya está al día solo hace falta calcular el valor de hoy
+        user_starts[user_id] = min(start_date, today)
+    return user_starts, transaction_ids, assets
+
+def partition_users(user_ids, partitions):
+    """Divide los usuarios ordenados en rangos contiguos de tamaño similar"""
+    user_ids = sorted(user_ids)
+    size = max(1, -(-len(user_ids) // partitions))
+    return [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+
+
+# Estado de cada proceso worker, inicializado una vez por proceso
+_worker = {}
+
+def _init_worker(shm_name, shape, start_date, asset_index, database_url):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm
+    _worker['prices'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker['start_date'] = start_date
+    _worker['asset_index'] = asset_index
+    _worker['day_ends'] = np.array(
+        [start_date + timedelta(days=i + 1) for i in range(shape[0])], dtype='datetime64[us]'
+    )
+    _worker['engine'] = create_engine(database_url, connect_args={"check_same_thread": False})
+
+def _value_user(rows):
+    """Valor del portfolio de un usuario para cada fila de la matriz de precios y si el día está completo.
+
+    Los días sin cierre real (NaN) valoran el activo al precio de su última transacción.
+    """
+    prices = _worker['prices']
+    day_ends = _worker['day_ends']
+    values = np.zeros(prices.shape[0])
+    complete = np.ones(prices.shape[0], dtype=bool)
+    for asset, asset_rows in itertools.groupby(
+        sorted(rows, key=lambda row: (row.ticker, row.asset_type, row.transaction_date)),
+        key=lambda row: (row.ticker, row.asset_type)
+    ):
+        asset_rows = list(asset_rows)
+        tx_dates = np.array([row.transaction_date for row in asset_rows], dtype='datetime64[us]')
+        quantity = quantities_at_close(tx_dates, [row.quantity for row in asset_rows], day_ends)
+        held = quantity > 0
+        asset_prices = prices[:, _worker['asset_index'][asset]]
+        missing = np.isnan(asset_prices)
+        if missing.any():
+            complete &= ~(held & missing)
+            last_prices = at_close(tx_dates, [row.price for row in asset_rows], day_ends)
+            asset_prices = np.where(missing, last_prices, asset_prices)
+        values += np.where(held, quantity * asset_prices, 0.0)
+    return values, complete
+
+def _value_partition(user_starts):
+    """Calcula los valores diarios faltantes y el valor actual de los usuarios de una partición"""
+    start_date = _worker['start_date']
+    user_ids = sorted(user_starts)
+    snapshot_rows = []
+    current_values = {}
+
+    stmt = select(
+        TransactionModel.user_id,
+        TransactionModel.ticker,
+        TransactionModel.asset_type,
+        TransactionModel.quantity,
+        TransactionModel.price,
+        TransactionModel.transaction_date
+    ).where(
+        TransactionModel.user_id.between(user_ids[0], user_ids[-1])
+    ).order_by(TransactionModel.user_id)
+
+    with _worker['engine'].connect() as conn:
+        result = conn.execution_options(yield_per=CHUNK_SIZE).execute(stmt)
+        for user_id, rows in itertools.groupby(result, key=lambda row: row.user_id):
+            if user_id not in user_starts:
+                continue
+            values, complete = _value_user(list(rows))
+            # La última fila es hoy: valor actual, no se guarda como día cerrado
+            first = (user_starts[user_id] - start_date).days
+            for offset in range(first, len(values) - 1):
+                snapshot_rows.append((
+                    user_id, start_date + timedelta(days=offset), float(values[offset]), bool(complete[offset])
+                ))
+            current_values[user_id] = float(values[-1])
+
+    return snapshot_rows, current_values
+
+def write_snapshots(engine, snapshot_rows, user_starts, transaction_ids):
+    """Inserta los valores diarios en lotes y devuelve cuántos quedaron guardados.
+
+    Los días que otra petición ya guardó se ignoran. Si un usuario tiene transacciones
+    posteriores a las del plan, sus valores se calcularon sin ellas y se descartan.
+    """
+    stmt = insert(PortfolioDailyValueModel).on_conflict_do_nothing(
+        index_elements=['user_id', 'date']
+    )
+    computed_at = datetime.now()
+    with engine.begin() as conn:
+        for i in range(0, len(snapshot_rows), WRITE_BATCH_SIZE):
+            conn.execute(stmt, [
+                {'user_id': user_id, 'date': day, 'value': value, 'is_complete': is_complete, 'computed_at': computed_at}
+                for user_id, day, value, is_complete in snapshot_rows[i:i + WRITE_BATCH_SIZE]
+            ])
+
+        # Con las filas ya escritas la base queda reservada: una transacción nueva o se
+        # ve en esta consulta o se confirma (e invalida los días) después del commit
+        current_ids = last_transaction_ids(conn)
+        stale_users = [
+            user_id for user_id in {row[0] for row in snapshot_rows}
+            if current_ids.get(user_id) != transaction_ids.get(user_id)
+        ]
+        for user_id in stale_users:
+            conn.execute(delete(PortfolioDailyValueModel).where(
+                PortfolioDailyValueModel.user_id == user_id,
+                PortfolioDailyValueModel.date >= user_starts[user_id]
+            ))
+
+    stale = set(stale_users)
+    return sum(1 for row in snapshot_rows if row[0] not in stale)
+
+def run_valuation_job(workers=None, database_url=SQLALCHEMY_DATABASE_URL, price_loader=get_price_matrix):
+    """Valora los portfolios de todos los usuarios y guarda los días cerrados que falten"""
+    workers = workers or os.cpu_count()
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    today = date.today()
+
+    user_starts, transaction_ids, assets = plan_users(engine, today)
+    if not user_starts:
+        return {'users': 0, 'snapshots': 0, 'current_values': {}}
+
+    # Cargar los precios una sola vez y copiarlos a memoria compartida
+    start_date = min(user_starts.values())
+    prices = price_loader(assets, start_date, today)
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        asset_index = {asset: column for column, asset in enumerate(assets)}
+
+        snapshot_rows = []
+        current_values = {}
+        partitions = partition_users(user_starts, workers * PARTITIONS_PER_WORKER)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shm.name, prices.shape, start_date, asset_index, database_url)
+        ) as executor:
+            for rows, values in executor.map(
+                _value_partition,
+                [{user_id: user_starts[user_id] for user_id in partition} for partition in partitions]
+            ):
+                snapshot_rows.extend(rows)
+                current_values.update(values)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    written = write_snapshots(engine, snapshot_rows, user_starts, transaction_ids)
+    engine.dispose()
+    return {'users': len(user_starts), 'snapshots': written, 'current_values': current_values}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Valora en paralelo los portfolios de todos los usuarios")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos a usar (por defecto, uno por CPU)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = run_valuation_job(workers=args.workers)
+    print(
+        f"{stats['users']} usuarios valorados, {stats['snapshots']} días agregados "
+        f"en {time.perf_counter() - started:.1f}s ({datetime.now():%Y-%m-%d %H:%M})"
+    )